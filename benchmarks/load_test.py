@@ -0,0 +1,155 @@
+"""Drive the main CashBook+ endpoints and report throughput and latency.
+
+    python benchmarks/seed.py
+    python benchmarks/load_test.py [--db benchmarks/bench.db] [--requests 200] [--concurrency 20]
+    python benchmarks/load_test.py --url http://localhost:8000   # a running server on a seeded database
+
+Without ``--url`` the app runs in-process on the seeded SQLite file (seeding
+it first if it does not exist). Each scenario is run on its own so results
+are comparable between commits. For in-process runs the SQL statements per
+request are read from the app's request metrics.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from seed import DEFAULT_DB, PASSWORD, CASHBOOK_NAMES, EXPENSES, ROOT, database_url, seed
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+class Scenario:
+    def __init__(self, name, route, request):
+        self.name = name
+        self.route = route
+        self.request = request
+
+
+def scenarios(users):
+    rng = random.Random(7)
+
+    async def login(client, n):
+        return await client.post("/api/login", json={"username": f"user{n % users}", "password": PASSWORD})
+
+    async def get_entries(client, n):
+        page = await client.get("/api/get_entries", params={"cashbook": CASHBOOK_NAMES[0]})
+        cursor = page.json().get("next_cursor")
+        if cursor:
+            page = await client.get("/api/get_entries", params={"cashbook": CASHBOOK_NAMES[0], "cursor": cursor})
+        return page
+
+    async def summary(client, n):
+        return await client.get(f"/api/summary/{CASHBOOK_NAMES[0]}")
+
+    etags = {}
+
+    async def dashboard(client, n):
+        # Revalidate like a browser would; unchanged cashbooks answer 304.
+        headers = {"If-None-Match": etags[client]} if client in etags else {}
+        response = await client.get(f"/api/dashboard/{CASHBOOK_NAMES[0]}", headers=headers)
+        etags[client] = response.headers.get("etag", "")
+        return response
+
+    async def add_entry(client, n):
+        return await client.post("/api/add_entry", json={
+            "cashbook": CASHBOOK_NAMES[0],
+            "type": "cash_out",
+            "amount": round(rng.uniform(10, 500), 2),
+            "note": rng.choice(EXPENSES),
+        })
+
+    async def export(client, n):
+        return await client.get("/api/export", params={"cashbook": CASHBOOK_NAMES[0], "format": "csv"})
+
+    return [
+        Scenario("login", "POST /api/login", login),
+        Scenario("get_entries", "GET /api/get_entries", get_entries),
+        Scenario("summary", "GET /api/summary/{cashbook}", summary),
+        Scenario("dashboard", "GET /api/dashboard/{cashbook}", dashboard),
+        Scenario("add_entry", "POST /api/add_entry", add_entry),
+        Scenario("export", "GET /api/export", export),
+    ]
+
+
+async def run(args):
+    import httpx
+
+    if args.url:
+        make_client = lambda: httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        os.environ.setdefault("SESSION_SWEEP_INTERVAL", "0")
+        sys.path.insert(0, ROOT)
+        os.chdir(ROOT)
+        import main
+        main.hasher.start()
+        transport = httpx.ASGITransport(app=main.app)
+        make_client = lambda: httpx.AsyncClient(transport=transport, base_url="https://testserver", timeout=60)
+
+    clients = [make_client() for _ in range(args.concurrency)]
+    for n, client in enumerate(clients):
+        response = await client.post("/api/login", json={"username": f"user{n % args.users}", "password": PASSWORD})
+        response.raise_for_status()
+
+    print(f"{args.requests} requests per scenario, {args.concurrency} concurrent")
+    print(f"{'scenario':<14}{'req/s':>9}{'p50':>11}{'p99':>11}{'errors':>8}{'sql/req':>9}")
+    for scenario in scenarios(args.users):
+        latencies, errors = [], 0
+        queue = asyncio.Queue()
+        for n in range(args.requests):
+            queue.put_nowait(n)
+
+        async def worker(client):
+            nonlocal errors
+            while not queue.empty():
+                n = queue.get_nowait()
+                start = time.perf_counter()
+                response = await scenario.request(client, n)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(c) for c in clients))
+        elapsed = time.perf_counter() - started
+
+        sql = ""
+        if not args.url:
+            route = main.metrics.routes.get(scenario.route)
+            sql = f"{route.queries / route.count:.1f}" if route and route.count else "-"
+            main.metrics.routes.pop(scenario.route, None)
+        print(
+            f"{scenario.name:<14}{len(latencies) / elapsed:>9.1f}"
+            f"{percentile(latencies, 50) * 1000:>9.1f}ms{percentile(latencies, 99) * 1000:>9.1f}ms"
+            f"{errors:>8}{sql:>9}"
+        )
+
+    for client in clients:
+        await client.aclose()
+    if not args.url:
+        main.hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--users", type=int, default=20, help="seeded users to log in as")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    if not args.url:
+        os.environ["DATABASE_URL"] = database_url(args.db)
+        if not os.path.exists(args.db):
+            seed(args.users, 3, 2000)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
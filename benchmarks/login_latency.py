@@ -0,0 +1,125 @@
+"""Login latency under concurrent load, with and without the hashing pool.
+
+    python benchmarks/login_latency.py [--logins 200] [--concurrency 50]
+
+Runs the app in-process against a throwaway SQLite database twice: once with
+PASSWORD_HASH_WORKERS=0 (hashing on the shared request threadpool, as before)
+and once with the process pool. For each run it reports login latency and
+the latency of a cheap authenticated request issued during the login burst.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USERS = 20
+PASSWORD = "benchmark-password"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_load(logins, concurrency):
+    import httpx
+    import main
+
+    main.Base.metadata.create_all(main.engine)
+    db = main.SessionLocal()
+    password_hash = main.hash_password(PASSWORD)
+    db.add_all([main.User(username=f"user{i}", password_hash=password_hash) for i in range(USERS)])
+    db.commit()
+    db.close()
+
+    main.hasher.start()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="https://testserver") as reader:
+        await reader.post("/api/login", json={"username": "user0", "password": PASSWORD})
+        login_times, read_times, rejected = [], [], 0
+        semaphore = asyncio.Semaphore(concurrency)
+        done = asyncio.Event()
+
+        async def login(i):
+            nonlocal rejected
+            async with semaphore, httpx.AsyncClient(transport=transport, base_url="https://testserver") as client:
+                start = time.perf_counter()
+                response = await client.post("/api/login", json={"username": f"user{i % USERS}", "password": PASSWORD})
+                if response.status_code == 503:
+                    rejected += 1
+                else:
+                    login_times.append(time.perf_counter() - start)
+
+        async def read():
+            while not done.is_set():
+                start = time.perf_counter()
+                await reader.get("/api/get_cashbooks")
+                read_times.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        reader_task = asyncio.create_task(read())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await reader_task
+    main.hasher.shutdown()
+    return {
+        "logins_per_s": len(login_times) / elapsed,
+        "login_p50_ms": percentile(login_times, 50) * 1000,
+        "login_p99_ms": percentile(login_times, 99) * 1000,
+        "read_p50_ms": percentile(read_times, 50) * 1000,
+        "read_p99_ms": percentile(read_times, 99) * 1000,
+        "rejected": rejected,
+    }
+
+
+def run_mode(workers, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            PASSWORD_HASH_WORKERS=str(workers),
+            PASSWORD_HASH_QUEUE=str(args.queue),
+            SESSION_SWEEP_INTERVAL="0",
+        )
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", "--logins", str(args.logins), "--concurrency", str(args.concurrency)],
+            env=env, cwd=ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="hashing processes for the pooled run")
+    parser.add_argument("--queue", type=int, default=1000, help="PASSWORD_HASH_QUEUE for both runs")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(asyncio.run(run_load(args.logins, args.concurrency))))
+        return
+
+    print(f"{args.logins} logins, {args.concurrency} concurrent")
+    print(f"{'mode':<16}{'logins/s':>10}{'login p50':>12}{'login p99':>12}{'read p50':>11}{'read p99':>11}{'503s':>7}")
+    for label, workers in (("threadpool", 0), (f"pool ({args.workers})", args.workers)):
+        r = run_mode(workers, args)
+        print(
+            f"{label:<16}{r['logins_per_s']:>10.1f}{r['login_p50_ms']:>10.1f}ms{r['login_p99_ms']:>10.1f}ms"
+            f"{r['read_p50_ms']:>9.1f}ms{r['read_p99_ms']:>9.1f}ms{r['rejected']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
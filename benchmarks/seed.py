@@ -0,0 +1,85 @@
+"""Seed a local SQLite database with realistic CashBook+ data for benchmarks.
+
+    python benchmarks/seed.py [--db benchmarks/bench.db] [--users 20] [--cashbooks 3] [--entries 2000]
+
+Every user is ``user<N>`` with password ``benchmark-password``. Entries span
+the last two years with a mix of incomes and everyday expenses.
+"""
+import argparse
+import os
+import random
+import sys
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(ROOT, "benchmarks", "bench.db")
+PASSWORD = "benchmark-password"
+CASHBOOK_NAMES = ["Personal", "Household", "Work", "Travel", "School", "Savings"]
+EXPENSES = ["groceries", "rent", "fuel", "electricity", "coffee", "books", "internet", "pharmacy", "dinner", "bus pass"]
+INCOMES = ["salary", "freelance", "refund", "interest", "gift"]
+
+
+def database_url(path):
+    return f"sqlite:///{os.path.abspath(path)}"
+
+
+def seed(users, cashbooks, entries, rng=None):
+    """Fill the database configured in DATABASE_URL; returns the entry count."""
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from sqlalchemy import insert
+    import main
+
+    rng = rng or random.Random(42)
+    main.Base.metadata.create_all(main.engine)
+    db = main.SessionLocal()
+    try:
+        password_hash = main.hash_password(PASSWORD)
+        db.execute(insert(main.User), [{"username": f"user{u}", "password_hash": password_hash} for u in range(users)])
+        user_ids = [uid for (uid,) in db.query(main.User.id).order_by(main.User.id)]
+        db.execute(insert(main.Cashbook), [
+            {"owner_id": uid, "name": CASHBOOK_NAMES[c % len(CASHBOOK_NAMES)]}
+            for uid in user_ids for c in range(cashbooks)
+        ])
+        today = date.today()
+        total = 0
+        for (cashbook_id,) in db.query(main.Cashbook.id):
+            rows = []
+            for _ in range(entries):
+                income = rng.random() < 0.15
+                rows.append({
+                    "id": str(uuid.uuid4()),
+                    "cashbook_id": cashbook_id,
+                    "date": today - timedelta(days=rng.randrange(730)),
+                    "type": "cash_in" if income else "cash_out",
+                    "amount": Decimal(f"{rng.uniform(500, 50000) if income else rng.uniform(10, 2500):.2f}"),
+                    "note": rng.choice(INCOMES if income else EXPENSES),
+                })
+            main.insert_entries(db, cashbook_id, rows)
+            total += len(rows)
+        main.rebuild_totals(db)
+        db.commit()
+        return total
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--cashbooks", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=2000, help="entries per cashbook")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    os.environ["DATABASE_URL"] = database_url(args.db)
+    total = seed(args.users, args.cashbooks, args.entries)
+    print(f"Seeded {args.db}: {args.users} users, {args.users * args.cashbooks} cashbooks, {total} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,59 @@
 
 import os
+import re
 import uuid
-from datetime import datetime
-from typing import Dict, Any, Optional, List
+import io
+import csv
+import json
+import base64
+import hashlib
+import hmac
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Any, Iterable, Optional, List, Tuple, Union
 
 from fastapi import FastAPI, Depends, HTTPException, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from passlib.context import CryptContext
+from fastapi.concurrency import run_in_threadpool
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship, Session
+from sqlalchemy import cast, create_engine, event, make_url, func, insert, or_, select, update, tuple_, Column, Index, Integer, String, Numeric, Date, DateTime, ForeignKey, LargeBinary
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker, declarative_base, relationship, Session, make_transient_to_detached
+from sqlalchemy.types import TypeDecorator
+
+from metrics import RequestStats, current_request, instrument_engine, metrics
+from passwords import hasher, hash_password, verify_password
 
 # ---------------- CONFIG ----------------
+logger = logging.getLogger(__name__)
 APP_TITLE = "CashBook+"
-app = FastAPI(title=APP_TITLE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the session sweeper and hashing pool; release them and the async engine on shutdown."""
+    sweeper = asyncio.create_task(session_sweeper()) if SESSION_SWEEP_INTERVAL > 0 else None
+    hasher.start()
+    try:
+        yield
+    finally:
+        if sweeper:
+            sweeper.cancel()
+        hasher.shutdown()
+        if async_engine is not None:
+            await async_engine.dispose()
+
+app = FastAPI(title=APP_TITLE, lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -29,16 +67,118 @@ app.add_middleware(
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 SESSION_COOKIE = "cb_session"
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+SESSION_MAX_AGE = 60 * 60 * 24 * 7
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", "60"))
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "3600"))
+# /api/metrics is only served when set, to requests sending "Authorization: Bearer <token>".
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+ENTRIES_PAGE_SIZE = 100
+ENTRIES_MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ["cashbook", "id", "date", "type", "amount", "note"]
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ROWS = 50000
+REPORT_MAX_DAYS = 400
+REPORT_MAX_MONTHS = 120
+CENTS = Decimal("0.01")
+ZERO = Decimal("0.00")
+MAX_AMOUNT = Decimal("10000000000")
 
 # ---------------- DATABASE ----------------
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL environment variable is missing")
-engine = create_engine(DATABASE_URL, connect_args={"sslmode": "require"}, pool_pre_ping=True)
+DB_ASYNC = os.getenv("DB_ASYNC", "").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_SSLMODE = os.getenv("DB_SSLMODE", "require")
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def engine_options(url: URL) -> Dict[str, Any]:
+    """create_engine/create_async_engine keyword arguments for ``url``.
+
+    SQLite gets neither pool sizing nor the Postgres SSL options, so a local
+    file such as ``sqlite:///data/cashbook.db`` works without a server.
+    """
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}} if url.get_driver_name() == "pysqlite" else {}
+    options = {
+        "pool_pre_ping": True,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    if url.get_backend_name() == "postgresql" and DB_SSLMODE != "disable":
+        # psycopg2 takes libpq's sslmode; asyncpg spells it ssl.
+        key = "ssl" if url.get_driver_name() == "asyncpg" else "sslmode"
+        options["connect_args"] = {key: DB_SSLMODE}
+    return options
+
+def enable_sqlite_foreign_keys(engine) -> None:
+    """SQLite only enforces foreign keys, and so ON DELETE CASCADE, when asked per connection."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _foreign_keys_on(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+def async_url(url: URL) -> URL:
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"DB_ASYNC is not supported for {url.get_backend_name()} databases")
+    return url.set(drivername=driver)
+
+# The sync engine always exists: CLI tools and the sync request mode use it.
+database_url = make_url(DATABASE_URL)
+engine = create_engine(database_url, **engine_options(database_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if DB_ASYNC:
+    async_engine = create_async_engine(async_url(database_url), **engine_options(async_url(database_url)))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+instrument_engine(engine)
+enable_sqlite_foreign_keys(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+    enable_sqlite_foreign_keys(async_engine.sync_engine)
+DBSession = Union[Session, AsyncSession]
 Base = declarative_base()
 
+class EntryId(TypeDecorator):
+    """Entry ids: uuid strings in Python, 16 bytes in the database.
+
+    Postgres stores them as its native UUID, other databases as a 16-byte
+    BLOB. Both compare bytewise, which orders the same as the lowercase
+    hex strings, so keyset cursors are unchanged.
+    """
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = value if isinstance(value, uuid.UUID) else uuid.UUID(value)
+        return value if dialect.name == "postgresql" else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return str(value if dialect.name == "postgresql" else uuid.UUID(bytes=value))
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
@@ -52,46 +192,222 @@ class Cashbook(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String)
     owner_id = Column(Integer, ForeignKey("users.id"))
-    entries = relationship("Entry", back_populates="cashbook", cascade="all, delete")
+    # Bumped by every entry change; served as the ETag of the cashbook's reads.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # The database cascades deletes to these (ON DELETE CASCADE), so deleting
+    # a cashbook never loads its entries.
+    entries = relationship("Entry", back_populates="cashbook", cascade="all, delete", passive_deletes=True)
     owner = relationship("User", back_populates="cashbooks")
+    totals = relationship("CashbookTotals", uselist=False, cascade="all, delete", passive_deletes=True)
+    months = relationship("CashbookMonth", cascade="all, delete", passive_deletes=True)
 
 
 class Entry(Base):
     __tablename__ = "entries"
-    id = Column(String, primary_key=True, index=True)
-    cashbook_id = Column(Integer, ForeignKey("cashbooks.id"))
-    date = Column(String)
+    id = Column(EntryId, primary_key=True)
+    cashbook_id = Column(Integer, ForeignKey("cashbooks.id", ondelete="CASCADE"))
+    date = Column(Date)
     type = Column(String)
-    amount = Column(Float)
+    amount = Column(Numeric(12, 2))
     note = Column(String)
     cashbook = relationship("Cashbook", back_populates="entries")
 
+    __table_args__ = (
+        Index("ix_entries_cashbook_date_id", "cashbook_id", "date", "id"),
+    )
+
+
+class CashbookTotals(Base):
+    """Running totals per cashbook, kept in step by add_entry/delete_entry.
+
+    Cashbooks without a row fall back to aggregating their entries; see
+    rebuild_totals.py to backfill or verify the table.
+    """
+    __tablename__ = "cashbook_totals"
+    cashbook_id = Column(Integer, ForeignKey("cashbooks.id", ondelete="CASCADE"), primary_key=True)
+    total_in = Column(Numeric(14, 2), nullable=False, default=0)
+    total_out = Column(Numeric(14, 2), nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)
+
+
+class CashbookMonth(Base):
+    """Per-month in/out totals for a cashbook, maintained alongside CashbookTotals.
+
+    Reports read these instead of scanning entries; rebuild_totals.py
+    recomputes them.
+    """
+    __tablename__ = "cashbook_months"
+    cashbook_id = Column(Integer, ForeignKey("cashbooks.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)
+    total_in = Column(Numeric(14, 2), nullable=False, default=0)
+    total_out = Column(Numeric(14, 2), nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)
+
 
 class SessionToken(Base):
     __tablename__ = "sessions"
     token = Column(String, primary_key=True, index=True)
     username = Column(String, ForeignKey("users.username"))
+    expires_at = Column(DateTime, index=True)
+
+# ---------------- METRICS ----------------
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    stats = RequestStats()
+    token = current_request.set(stats)
+    started = time.perf_counter()
+
+    def record(status_code: int) -> None:
+        route = request.scope.get("route")
+        if route is not None and request.url.path.startswith("/api/"):
+            metrics.record(f"{request.method} {route.path}", status_code, time.perf_counter() - started, stats)
 
-# ---------------- HELPERS ----------------
-def get_db():
-    db = SessionLocal()
     try:
-        yield db
+        response = await call_next(request)
+    except Exception:
+        # Unhandled errors become a 500 further out; count them here.
+        record(500)
+        raise
     finally:
-        db.close()
+        current_request.reset(token)
+    if request.scope.get("route") is None or not request.url.path.startswith("/api/"):
+        return response
+    body = response.body_iterator
+
+    # Record once the body is sent so streamed exports count in full.
+    async def recorded_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            record(response.status_code)
+
+    response.body_iterator = recorded_body()
+    return response
+
+# ---------------- SESSION CACHE ----------------
+class SessionCache:
+    """Bounded LRU of session token -> (user id, username, expiry).
+
+    Entries live for at most ``ttl`` seconds so that a logout handled by
+    another worker process is picked up within that window; they never
+    outlive the session's own server-side expiry.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[int, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Tuple[int, str]]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(token)
+            if item is None:
+                return None
+            user_id, username, deadline = item
+            if deadline <= now:
+                del self._items[token]
+                return None
+            self._items.move_to_end(token)
+            return user_id, username
+
+    def put(self, token: str, user_id: int, username: str, expires_at: datetime) -> None:
+        if self.max_size <= 0:
+            return
+        remaining = (expires_at - datetime.utcnow()).total_seconds()
+        deadline = time.monotonic() + min(self.ttl, remaining)
+        with self._lock:
+            self._items[token] = (user_id, username, deadline)
+            self._items.move_to_end(token)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            self._items.pop(token, None)
+
+
+session_cache = SessionCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
 
-def require_user(request: Request, db: Session = Depends(get_db)) -> User:
+def sweep_expired_sessions(db: Session) -> int:
+    deleted = db.query(SessionToken).filter(SessionToken.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+async def session_sweeper():
+    while True:
+        try:
+            async with db_session() as db:
+                await run_db(db, sweep_expired_sessions)
+        except Exception:
+            logger.exception("Expired session sweep failed")
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+
+# ---------------- HELPERS ----------------
+@asynccontextmanager
+async def db_session():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+async def get_db():
+    async with db_session() as db:
+        yield db
+
+async def run_db(db: DBSession, fn, *args):
+    """Run ``fn(session, *args)`` without blocking the event loop.
+
+    Handlers keep their ORM code in plain sync functions. In async mode they
+    run through ``AsyncSession.run_sync`` so lazy loads still work, otherwise
+    on the threadpool with the sync session.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
+
+def lookup_session(db: Session, token: str) -> Optional[Tuple[User, Optional[datetime]]]:
+    return (
+        db.query(User, SessionToken.expires_at)
+        .join(SessionToken, SessionToken.username == User.username)
+        .filter(SessionToken.token == token)
+        .first()
+    )
+
+async def require_user(request: Request, db: DBSession = Depends(get_db)) -> User:
     token = request.cookies.get(SESSION_COOKIE)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    session = db.query(SessionToken).filter(SessionToken.token == token).first()
-    if not session:
+    cached = session_cache.get(token)
+    if cached:
+        # Attach a stand-in for the cached user without a round-trip;
+        # unloaded attributes (password_hash, cashbooks) load on access.
+        user = User(id=cached[0], username=cached[1])
+        make_transient_to_detached(user)
+        sync_db = db.sync_session if isinstance(db, AsyncSession) else db
+        return sync_db.merge(user, load=False)
+    row = await run_db(db, lookup_session, token)
+    if not row:
         raise HTTPException(status_code=401, detail="Invalid session")
-    user = db.query(User).filter(User.username == session.username).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    user, expires_at = row
+    if expires_at is None or expires_at <= datetime.utcnow():
+        raise HTTPException(status_code=401, detail="Session expired")
+    session_cache.put(token, user.id, user.username, expires_at)
     return user
 
+def get_cashbook(db: Session, user: User, name: str) -> Cashbook:
+    cashbook = db.query(Cashbook).filter(Cashbook.owner == user, Cashbook.name == name).first()
+    if not cashbook:
+        raise HTTPException(status_code=404, detail="Cashbook not found")
+    return cashbook
+
 def sanitize_cashbook_name(name: str) -> str:
     name = (name or "").strip()
     if not name:
@@ -100,10 +416,262 @@ def sanitize_cashbook_name(name: str) -> str:
         raise HTTPException(status_code=400, detail="Cashbook name too long")
     return name
 
-def summarize(entries: List[Entry]) -> Dict[str, Any]:
-    total_in = sum(e.amount for e in entries if e.type == "cash_in")
-    total_out = sum(e.amount for e in entries if e.type == "cash_out")
-    return {"total_in": round(total_in, 2), "total_out": round(total_out, 2), "balance": round(total_in - total_out, 2)}
+def parse_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid date")
+
+def parse_amount(value: Any) -> Decimal:
+    """Parse a positive amount to cents; raises ValueError otherwise."""
+    try:
+        amount = Decimal(str(value))
+        # NaN quantizes to NaN and only fails at the comparison below.
+        if not amount.is_finite():
+            raise ValueError("Invalid amount")
+        amount = amount.quantize(CENTS)
+    except (InvalidOperation, TypeError):
+        raise ValueError("Invalid amount")
+    if not ZERO < amount < MAX_AMOUNT:
+        raise ValueError("Invalid amount")
+    return amount
+
+def request_variant(request: Request) -> str:
+    """Digest of the path and normalized query, so each URL gets its own ETag."""
+    key = request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+def cashbook_etag(cb: Cashbook, variant: str) -> str:
+    return f'W/"{cb.id}.{cb.version}.{variant}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+def read_cashbook(
+    db: Session, user: User, cashbook: str, variant: str, if_none_match: Optional[str], fn, *args
+) -> Tuple[str, Optional[Any]]:
+    """Look up the cashbook and return ``(etag, fn(db, cashbook, *args))``.
+
+    When ``if_none_match`` already names the current version of this
+    ``variant`` the body is ``None`` and ``fn`` never runs, so nothing but
+    the cashbook row is read.
+    """
+    cb = get_cashbook(db, user, sanitize_cashbook_name(cashbook))
+    etag = cashbook_etag(cb, variant)
+    if etag_matches(if_none_match, etag):
+        return etag, None
+    return etag, fn(db, cb, *args)
+
+async def cashbook_response(request: Request, db: DBSession, user: User, cashbook: str, fn, *args) -> Response:
+    if_none_match = request.headers.get("if-none-match")
+    etag, body = await run_db(db, read_cashbook, user, cashbook, request_variant(request), if_none_match, fn, *args)
+    # no-cache: browsers may keep the body but must revalidate before reuse.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+def entry_to_dict(e: Entry) -> Dict[str, Any]:
+    return {"id": e.id, "date": e.date.isoformat(), "type": e.type, "amount": float(e.amount), "note": e.note}
+
+def encode_cursor(e: Entry) -> str:
+    return base64.urlsafe_b64encode(json.dumps([e.date.isoformat(), e.id]).encode()).decode()
+
+def normalize_entry_id(value: Any) -> Optional[str]:
+    """The canonical form of an entry id, or None if it is not a uuid."""
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+def decode_cursor(cursor: str) -> Tuple[date, str]:
+    try:
+        date_str, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(date_str), str(uuid.UUID(entry_id))
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def validate_import_rows(rows: List[Any], cashbook_id: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Validate raw import rows in one pass.
+
+    Returns ``(values, errors)``: insert-ready column dicts for the valid rows
+    and ``{"row": n, "error": ...}`` (1-based) for the rest. Bank statements
+    repeat the same few dates, so each distinct date string is parsed once.
+    """
+    today = datetime.utcnow().date()
+    seen_dates: Dict[str, Optional[date]] = {}
+    values, errors = [], []
+    for n, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({"row": n, "error": "Row must be an object"})
+            continue
+        entry_type = row.get("type")
+        if entry_type not in ("cash_in", "cash_out"):
+            errors.append({"row": n, "error": "Invalid type"})
+            continue
+        date_str = str(row.get("date") or "").strip()
+        if date_str not in seen_dates:
+            try:
+                seen_dates[date_str] = datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else today
+            except ValueError:
+                seen_dates[date_str] = None
+        entry_date = seen_dates[date_str]
+        if entry_date is None:
+            errors.append({"row": n, "error": "Invalid date"})
+            continue
+        try:
+            amount = parse_amount(row.get("amount") or 0)
+        except ValueError:
+            errors.append({"row": n, "error": "Invalid amount"})
+            continue
+        values.append({
+            "id": str(uuid.uuid4()),
+            "cashbook_id": cashbook_id,
+            "date": entry_date,
+            "type": entry_type,
+            "amount": amount,
+            "note": str(row.get("note") or ""),
+        })
+    return values, errors
+
+def summarize(total_in: Decimal, total_out: Decimal) -> Dict[str, Any]:
+    return {"total_in": float(total_in), "total_out": float(total_out), "balance": float(total_in - total_out)}
+
+def aggregate_totals(db: Session, cashbook_id: int) -> Tuple[Decimal, Decimal, int]:
+    """Compute (total_in, total_out, entry_count) from the raw entries."""
+    rows = (
+        db.query(Entry.type, func.coalesce(func.sum(Entry.amount), 0), func.count(Entry.id))
+        .filter(Entry.cashbook_id == cashbook_id)
+        .group_by(Entry.type)
+        .all()
+    )
+    totals = {entry_type: (Decimal(amount).quantize(CENTS), count) for entry_type, amount, count in rows}
+    total_in, count_in = totals.get("cash_in", (ZERO, 0))
+    total_out, count_out = totals.get("cash_out", (ZERO, 0))
+    return total_in, total_out, count_in + count_out
+
+def cashbook_totals(db: Session, cashbook_id: int) -> Tuple[Decimal, Decimal]:
+    row = db.query(CashbookTotals.total_in, CashbookTotals.total_out).filter(CashbookTotals.cashbook_id == cashbook_id).first()
+    if row:
+        return row.total_in, row.total_out
+    total_in, total_out, _ = aggregate_totals(db, cashbook_id)
+    return total_in, total_out
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def upsert(db: Session):
+    """The dialect's INSERT construct, which supports ON CONFLICT on Postgres and SQLite."""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+def apply_to_totals(db: Session, cashbook_id: int, entries: Iterable[Tuple[date, str, Decimal]], sign: int = 1) -> None:
+    """Fold (date, type, amount) entries into the running totals and monthly rollups.
+
+    ``sign=-1`` removes them again. Also bumps the cashbook's version. Every
+    change is a relative UPDATE or upsert, so concurrent writers never lose
+    an increment; commit it in the same transaction as the entry change.
+    """
+    months: Dict[date, List[Any]] = {}
+    for entry_date, entry_type, amount in entries:
+        bucket = months.setdefault(month_start(entry_date), [ZERO, ZERO, 0])
+        bucket[0 if entry_type == "cash_in" else 1] += amount * sign
+        bucket[2] += sign
+    if not months:
+        return
+    db.execute(update(Cashbook).where(Cashbook.id == cashbook_id).values(version=Cashbook.version + 1))
+    db.execute(
+        update(CashbookTotals)
+        .where(CashbookTotals.cashbook_id == cashbook_id)
+        .values(
+            total_in=CashbookTotals.total_in + sum(b[0] for b in months.values()),
+            total_out=CashbookTotals.total_out + sum(b[1] for b in months.values()),
+            entry_count=CashbookTotals.entry_count + sum(b[2] for b in months.values()),
+        )
+    )
+    stmt = upsert(db)(CashbookMonth)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CashbookMonth.cashbook_id, CashbookMonth.month],
+            set_={
+                "total_in": CashbookMonth.total_in + stmt.excluded.total_in,
+                "total_out": CashbookMonth.total_out + stmt.excluded.total_out,
+                "entry_count": CashbookMonth.entry_count + stmt.excluded.entry_count,
+            },
+        ),
+        [
+            {"cashbook_id": cashbook_id, "month": month, "total_in": b[0], "total_out": b[1], "entry_count": b[2]}
+            for month, b in sorted(months.items())
+        ],
+    )
+    if sign < 0:
+        # Months that lost their last entry have no rollup, as rebuild_totals expects.
+        db.query(CashbookMonth).filter(
+            CashbookMonth.cashbook_id == cashbook_id,
+            CashbookMonth.month.in_(list(months)),
+            CashbookMonth.entry_count <= 0,
+        ).delete(synchronize_session=False)
+
+def rebuild_totals(db: Session, fix: bool = True) -> List[Dict[str, Any]]:
+    """Recompute every cashbook's totals and monthly rollups from its entries.
+
+    Returns the cashbooks whose stored totals or rollups were missing or
+    disagreed with the entries. With ``fix`` the stored rows are rewritten;
+    the caller commits.
+    """
+    cashbook_ids = [cashbook_id for (cashbook_id,) in db.query(Cashbook.id)]
+    actual_months: Dict[Tuple[int, date], List[Any]] = {}
+    # Grouping by day keeps this portable and still collapses most rows.
+    rows = (
+        db.query(Entry.cashbook_id, Entry.date, Entry.type, func.coalesce(func.sum(Entry.amount), 0), func.count(Entry.id))
+        .group_by(Entry.cashbook_id, Entry.date, Entry.type)
+    )
+    for cashbook_id, entry_date, entry_type, amount, count in rows:
+        bucket = actual_months.setdefault((cashbook_id, month_start(entry_date)), [ZERO, ZERO, 0])
+        bucket[0 if entry_type == "cash_in" else 1] += Decimal(amount).quantize(CENTS)
+        bucket[2] += count
+    stored_months = {(m.cashbook_id, m.month): m for m in db.query(CashbookMonth)}
+    stale_months = set()
+    for key in set(actual_months) | set(stored_months):
+        month, expected = stored_months.get(key), actual_months.get(key)
+        if month is None or expected is None or [month.total_in, month.total_out, month.entry_count] != expected:
+            stale_months.add(key[0])
+
+    actual = {cashbook_id: [ZERO, ZERO, 0] for cashbook_id in cashbook_ids}
+    for (cashbook_id, _), (total_in, total_out, count) in actual_months.items():
+        if cashbook_id in actual:
+            actual[cashbook_id][0] += total_in
+            actual[cashbook_id][1] += total_out
+            actual[cashbook_id][2] += count
+    stored = {t.cashbook_id: t for t in db.query(CashbookTotals)}
+
+    mismatches = []
+    for cashbook_id, (total_in, total_out, entry_count) in actual.items():
+        row = stored.get(cashbook_id)
+        totals_ok = row is not None and [row.total_in, row.total_out, row.entry_count] == [total_in, total_out, entry_count]
+        if totals_ok and cashbook_id not in stale_months:
+            continue
+        mismatches.append({
+            "cashbook_id": cashbook_id,
+            "stored": None if row is None else {**summarize(row.total_in, row.total_out), "entry_count": row.entry_count},
+            "actual": {**summarize(total_in, total_out), "entry_count": entry_count},
+            "monthly_rollups_stale": cashbook_id in stale_months,
+        })
+        if fix:
+            if row is None:
+                row = CashbookTotals(cashbook_id=cashbook_id)
+                db.add(row)
+            row.total_in, row.total_out, row.entry_count = total_in, total_out, entry_count
+            db.execute(update(Cashbook).where(Cashbook.id == cashbook_id).values(version=Cashbook.version + 1))
+            db.query(CashbookMonth).filter(CashbookMonth.cashbook_id == cashbook_id).delete(synchronize_session=False)
+            db.add_all(
+                CashbookMonth(cashbook_id=cashbook_id, month=month, total_in=b[0], total_out=b[1], entry_count=b[2])
+                for (cb_id, month), b in actual_months.items()
+                if cb_id == cashbook_id
+            )
+    return mismatches
 
 # ------------------- PAGES --------------------
 @app.get("/", include_in_schema=False)
@@ -127,151 +695,456 @@ async def cashbooks_page() -> FileResponse:
     return FileResponse("static/cashbooks.html")
 
 # -------------------- AUTH --------------------
+def find_user(db: Session, username: str) -> Optional[User]:
+    return db.query(User).filter(User.username == username).first()
+
+def create_user(db: Session, username: str, password_hash: str) -> None:
+    db.add(User(username=username, password_hash=password_hash))
+    db.commit()
+
+def create_session(db: Session, user: User) -> Tuple[str, datetime]:
+    token = str(uuid.uuid4())
+    expires_at = datetime.utcnow() + timedelta(seconds=SESSION_MAX_AGE)
+    db.add(SessionToken(token=token, username=user.username, expires_at=expires_at))
+    db.commit()
+    return token, expires_at
+
+def update_password_hash(db: Session, user: User, password_hash: str) -> None:
+    user.password_hash = password_hash
+    db.commit()
+
+def delete_session(db: Session, token: str) -> None:
+    db.query(SessionToken).filter(SessionToken.token == token).delete(synchronize_session=False)
+    db.commit()
+
 @app.post("/api/register")
-def register(payload: Dict[str, Any], db: Session = Depends(get_db)):
+async def register(payload: Dict[str, Any], db: DBSession = Depends(get_db)):
     username = (payload.get("username") or "").strip()
     password = payload.get("password") or ""
     if not username or not password:
         raise HTTPException(status_code=400, detail="Username and password required")
     if len(username) < 3 or len(password) < 6:
         raise HTTPException(status_code=400, detail="Username or password too short")
-    if db.query(User).filter(User.username == username).first():
+    if await run_db(db, find_user, username):
         raise HTTPException(status_code=409, detail="Username already exists")
-    user = User(username=username, password_hash=pwd_context.hash(password))
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    password_hash = await hasher.run(hash_password, password)
+    await run_db(db, create_user, username, password_hash)
     return {"message": "Registered successfully"}
 
 @app.post("/api/login")
-def login(payload: Dict[str, Any], response: Response, db: Session = Depends(get_db)):
+async def login(payload: Dict[str, Any], response: Response, db: DBSession = Depends(get_db)):
     username = (payload.get("username") or "").strip()
     password = payload.get("password") or ""
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not pwd_context.verify(password, user.password_hash):
+    user = await run_db(db, find_user, username)
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = str(uuid.uuid4())
-    session = SessionToken(token=token, username=username)
-    db.add(session)
-    db.commit()
-    response.set_cookie(key=SESSION_COOKIE, value=token, httponly=True, samesite="lax", secure=True, max_age=60*60*24*7)
+    valid, new_hash = await hasher.run(verify_password, password, user.password_hash)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    user_id = user.id
+    if new_hash:
+        await run_db(db, update_password_hash, user, new_hash)
+    token, expires_at = await run_db(db, create_session, user)
+    session_cache.put(token, user_id, username, expires_at)
+    response.set_cookie(key=SESSION_COOKIE, value=token, httponly=True, samesite="lax", secure=True, max_age=SESSION_MAX_AGE)
     return {"message": "Logged in", "username": username}
 
 @app.post("/api/logout")
-def logout(request: Request, response: Response, db: Session = Depends(get_db)):
+async def logout(request: Request, response: Response, db: DBSession = Depends(get_db)):
     token = request.cookies.get(SESSION_COOKIE)
     if token:
-        session = db.query(SessionToken).filter(SessionToken.token == token).first()
-        if session:
-            db.delete(session)
-            db.commit()
+        session_cache.invalidate(token)
+        await run_db(db, delete_session, token)
     response.delete_cookie(SESSION_COOKIE)
     return {"message": "Logged out"}
 
 # ---------------- CASHBOOKS -------------------
-@app.post("/api/create_cashbook")
-def create_cashbook(payload: Dict[str, Any], user: User = Depends(require_user), db: Session = Depends(get_db)):
-    name = sanitize_cashbook_name(payload.get("name", ""))
+def create_cashbook_sync(db: Session, user: User, name: str) -> None:
     if db.query(Cashbook).filter(Cashbook.owner == user, Cashbook.name == name).first():
         raise HTTPException(status_code=409, detail="Cashbook already exists")
-    cashbook = Cashbook(name=name, owner=user)
+    cashbook = Cashbook(name=name, owner=user, totals=CashbookTotals(total_in=0, total_out=0, entry_count=0))
     db.add(cashbook)
     db.commit()
-    db.refresh(cashbook)
+
+def list_cashbooks(db: Session, user: User) -> List[str]:
+    return [name for (name,) in db.query(Cashbook.name).filter(Cashbook.owner_id == user.id)]
+
+def delete_cashbook_sync(db: Session, user: User, name: str) -> None:
+    db.delete(get_cashbook(db, user, name))
+    db.commit()
+
+@app.post("/api/create_cashbook")
+async def create_cashbook(payload: Dict[str, Any], user: User = Depends(require_user), db: DBSession = Depends(get_db)):
+    name = sanitize_cashbook_name(payload.get("name", ""))
+    await run_db(db, create_cashbook_sync, user, name)
     return {"message": "Cashbook created", "name": name}
 
 @app.get("/api/get_cashbooks")
-def get_cashbooks(user: User = Depends(require_user)):
-    return {"username": user.username, "cashbooks": [c.name for c in user.cashbooks]}
+async def get_cashbooks(user: User = Depends(require_user), db: DBSession = Depends(get_db)):
+    return {"username": user.username, "cashbooks": await run_db(db, list_cashbooks, user)}
 
 @app.delete("/api/delete_cashbook")
-def delete_cashbook(payload: Dict[str, Any], user: User = Depends(require_user), db: Session = Depends(get_db)):
+async def delete_cashbook(payload: Dict[str, Any], user: User = Depends(require_user), db: DBSession = Depends(get_db)):
     name = sanitize_cashbook_name(payload.get("name", ""))
-    cashbook = db.query(Cashbook).filter(Cashbook.owner == user, Cashbook.name == name).first()
-    if not cashbook:
-        raise HTTPException(status_code=404, detail="Cashbook not found")
-    db.delete(cashbook)
-    db.commit()
+    await run_db(db, delete_cashbook_sync, user, name)
     return {"message": f"Cashbook '{name}' deleted successfully"}
 
 if __name__ == "__main__":
     Base.metadata.create_all(engine)
- 
-@app.post("/api/add_entry")
-def add_entry(payload: Dict[str, Any], user: User = Depends(require_user), db: Session = Depends(get_db)):
-    name = sanitize_cashbook_name(payload.get("cashbook", ""))
-    cashbook = db.query(Cashbook).filter(Cashbook.owner == user, Cashbook.name == name).first()
-    if not cashbook:
-        raise HTTPException(status_code=404, detail="Cashbook not found")
+
+# ----------------- ENTRIES --------------------
+def add_entry_sync(db: Session, user: User, payload: Dict[str, Any]) -> Dict[str, Any]:
+    cashbook = get_cashbook(db, user, sanitize_cashbook_name(payload.get("cashbook", "")))
     entry_type = payload.get("type")
     if entry_type not in ("cash_in", "cash_out"):
         raise HTTPException(status_code=400, detail="Invalid type")
     try:
-        date_str = payload.get("date") or datetime.utcnow().strftime("%Y-%m-%d")
-        datetime.strptime(date_str, "%Y-%m-%d")
-        amount = float(payload.get("amount") or 0)
-        if amount <= 0:
-            raise ValueError()
-    except:
+        date_str = payload.get("date")
+        entry_date = datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else datetime.utcnow().date()
+        amount = parse_amount(payload.get("amount") or 0)
+    except (TypeError, ValueError):
         raise HTTPException(status_code=400, detail="Invalid date or amount")
     note = payload.get("note") or ""
-    entry = Entry(id=str(uuid.uuid4()), cashbook=cashbook, date=date_str, type=entry_type, amount=amount, note=note)
+    entry = Entry(id=str(uuid.uuid4()), cashbook=cashbook, date=entry_date, type=entry_type, amount=amount, note=note)
     db.add(entry)
+    apply_to_totals(db, cashbook.id, [(entry_date, entry_type, amount)])
     db.commit()
     db.refresh(entry)
-    return {"message": "Entry added", "entry": {"id": entry.id, "date": entry.date, "type": entry.type, "amount": entry.amount, "note": entry.note}}
+    return entry_to_dict(entry)
 
-@app.get("/api/get_entries")
-def get_entries(cashbook: str, user: User = Depends(require_user), db: Session = Depends(get_db)):
-    name = sanitize_cashbook_name(cashbook)
-    cb = db.query(Cashbook).filter(Cashbook.owner == user, Cashbook.name == name).first()
-    if not cb:
-        raise HTTPException(status_code=404, detail="Cashbook not found")
-    entries = cb.entries
-    return {"entries": [{"id": e.id, "date": e.date, "type": e.type, "amount": e.amount, "note": e.note} for e in entries]}
+def entries_page(
+    db: Session,
+    cb: Cashbook,
+    cursor: Optional[str],
+    limit: int,
+    date_from: Optional[str],
+    date_to: Optional[str],
+    entry_type: Optional[str],
+    q: Optional[str],
+) -> Dict[str, Any]:
+    limit = max(1, min(limit, ENTRIES_MAX_PAGE_SIZE))
+    query = db.query(Entry).filter(Entry.cashbook_id == cb.id)
+    if date_from:
+        query = query.filter(Entry.date >= parse_date(date_from))
+    if date_to:
+        query = query.filter(Entry.date <= parse_date(date_to))
+    if entry_type:
+        if entry_type not in ("cash_in", "cash_out"):
+            raise HTTPException(status_code=400, detail="Invalid type")
+        query = query.filter(Entry.type == entry_type)
+    if q:
+        q = q.strip()
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        matches = Entry.note.ilike(f"%{pattern}%", escape="\\")
+        if re.fullmatch(r"[0-9.]+", q):
+            # Numeric searches also match the amount, as the dashboard's search always has.
+            matches = or_(matches, cast(Entry.amount, String).like(f"%{q}%"))
+        query = query.filter(matches)
+    if cursor:
+        query = query.filter(tuple_(Entry.date, Entry.id) < decode_cursor(cursor))
+    entries = query.order_by(Entry.date.desc(), Entry.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return {"entries": [entry_to_dict(e) for e in entries[:limit]], "next_cursor": next_cursor}
 
-@app.delete("/api/delete_entry/{entry_id}")
-def delete_entry(entry_id: str, cashbook: str, user: User = Depends(require_user), db: Session = Depends(get_db)):
-    name = sanitize_cashbook_name(cashbook)
-    cb = db.query(Cashbook).filter(Cashbook.owner == user, Cashbook.name == name).first()
-    if not cb:
-        raise HTTPException(status_code=404, detail="Cashbook not found")
-    entry = db.query(Entry).filter(Entry.cashbook == cb, Entry.id == entry_id).first()
+def delete_entry_sync(db: Session, user: User, cashbook: str, entry_id: str) -> None:
+    cb = get_cashbook(db, user, sanitize_cashbook_name(cashbook))
+    entry_id = normalize_entry_id(entry_id)
+    entry = entry_id and db.query(Entry).filter(Entry.cashbook == cb, Entry.id == entry_id).first()
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     db.delete(entry)
+    apply_to_totals(db, cb.id, [(entry.date, entry.type, entry.amount)], sign=-1)
     db.commit()
+
+def cashbook_summary(db: Session, cb: Cashbook) -> Dict[str, Any]:
+    return summarize(*cashbook_totals(db, cb.id))
+
+def dashboard_body(db: Session, cb: Cashbook, *page_args) -> Dict[str, Any]:
+    return {**entries_page(db, cb, *page_args), "summary": cashbook_summary(db, cb), "version": cb.version}
+
+@app.post("/api/add_entry")
+async def add_entry(payload: Dict[str, Any], user: User = Depends(require_user), db: DBSession = Depends(get_db)):
+    entry = await run_db(db, add_entry_sync, user, payload)
+    return {"message": "Entry added", "entry": entry}
+
+@app.get("/api/get_entries")
+async def get_entries(
+    cashbook: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = ENTRIES_PAGE_SIZE,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    type: Optional[str] = None,
+    q: Optional[str] = None,
+    user: User = Depends(require_user),
+    db: DBSession = Depends(get_db),
+):
+    """Return one page of entries, newest first, ordered by (date, id).
+
+    Pass the returned ``next_cursor`` back as ``cursor`` to fetch the next
+    page; it is null once the last page has been served. Responses carry
+    the cashbook version as ETag and answer a matching ``If-None-Match``
+    with 304.
+    """
+    return await cashbook_response(request, db, user, cashbook, entries_page, cursor, limit, date_from, date_to, type, q)
+
+@app.get("/api/dashboard/{cashbook}")
+async def dashboard(
+    cashbook: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = ENTRIES_PAGE_SIZE,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    type: Optional[str] = None,
+    q: Optional[str] = None,
+    user: User = Depends(require_user),
+    db: DBSession = Depends(get_db),
+):
+    """A page of entries (as /api/get_entries) plus the cashbook summary and version, in one round-trip."""
+    return await cashbook_response(request, db, user, cashbook, dashboard_body, cursor, limit, date_from, date_to, type, q)
+
+def insert_entries(db: Session, cashbook_id: int, values: List[Dict[str, Any]]) -> None:
+    """Insert validated rows with batched executemany and update the totals once."""
+    for start in range(0, len(values), IMPORT_BATCH_SIZE):
+        db.execute(insert(Entry), values[start:start + IMPORT_BATCH_SIZE])
+    apply_to_totals(db, cashbook_id, ((v["date"], v["type"], v["amount"]) for v in values))
+
+def import_entries_sync(db: Session, user: User, cashbook: str, rows: List[Any]) -> Dict[str, Any]:
+    cb = get_cashbook(db, user, sanitize_cashbook_name(cashbook))
+    values, errors = validate_import_rows(rows, cb.id)
+    if values:
+        insert_entries(db, cb.id, values)
+        db.commit()
+    return {"message": f"Imported {len(values)} entries", "imported": len(values), "errors": errors}
+
+@app.post("/api/import_entries")
+async def import_entries(cashbook: str, request: Request, user: User = Depends(require_user), db: DBSession = Depends(get_db)):
+    """Bulk-add entries from a JSON array or a CSV body (``Content-Type: text/csv``).
+
+    CSV needs a header row naming ``date``, ``type``, ``amount`` and
+    ``note``. Valid rows are inserted in one transaction; invalid ones are
+    skipped and reported by row number.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            rows = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+        else:
+            rows = json.loads(body)
+    except (UnicodeDecodeError, ValueError, csv.Error):
+        raise HTTPException(status_code=400, detail="Could not parse import body")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a list of entries")
+    if len(rows) > IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {IMPORT_MAX_ROWS} entries per import")
+    return await run_db(db, import_entries_sync, user, cashbook, rows)
+
+@app.delete("/api/delete_entry/{entry_id}")
+async def delete_entry(entry_id: str, cashbook: str, user: User = Depends(require_user), db: DBSession = Depends(get_db)):
+    await run_db(db, delete_entry_sync, user, cashbook, entry_id)
     return {"message": "Entry deleted"}
 
 @app.get("/api/summary/{cashbook}")
-def summary_api(cashbook: str, user: User = Depends(require_user), db: Session = Depends(get_db)):
-    name = sanitize_cashbook_name(cashbook)
-    cb = db.query(Cashbook).filter(Cashbook.owner == user, Cashbook.name == name).first()
-    if not cb:
-        raise HTTPException(status_code=404, detail="Cashbook not found")
-    return summarize(cb.entries)
+async def summary_api(cashbook: str, request: Request, user: User = Depends(require_user), db: DBSession = Depends(get_db)):
+    return await cashbook_response(request, db, user, cashbook, cashbook_summary)
 
-@app.get("/api/export")
-def export(cashbook: Optional[str] = None, user: User = Depends(require_user), db: Session = Depends(get_db)):
+# ------------------ REPORTS -------------------
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+def report_sync(db: Session, user: User, cashbook: str, start: date, end: date, granularity: str) -> Dict[str, Any]:
+    cb = get_cashbook(db, user, sanitize_cashbook_name(cashbook))
+    first_month = month_start(start)
+    opening_in, opening_out = (
+        db.query(func.coalesce(func.sum(CashbookMonth.total_in), 0), func.coalesce(func.sum(CashbookMonth.total_out), 0))
+        .filter(CashbookMonth.cashbook_id == cb.id, CashbookMonth.month < first_month)
+        .one()
+    )
+    opening = Decimal(opening_in) - Decimal(opening_out)
+    totals: Dict[date, List[Decimal]] = {}
+    if granularity == "month":
+        rows = (
+            db.query(CashbookMonth.month, CashbookMonth.total_in, CashbookMonth.total_out)
+            .filter(CashbookMonth.cashbook_id == cb.id, CashbookMonth.month.between(first_month, month_start(end)))
+        )
+        for month, total_in, total_out in rows:
+            totals[month] = [total_in, total_out]
+        periods = []
+        month = first_month
+        while month <= end:
+            periods.append(month)
+            month = add_months(month, 1)
+    else:
+        # Rollups cover whole months; days before ``start`` in its month come from the entries.
+        rows = (
+            db.query(Entry.date, Entry.type, func.sum(Entry.amount))
+            .filter(Entry.cashbook_id == cb.id, Entry.date >= first_month, Entry.date <= end)
+            .group_by(Entry.date, Entry.type)
+        )
+        for entry_date, entry_type, amount in rows:
+            amount = Decimal(amount).quantize(CENTS)
+            if entry_date < start:
+                opening += amount if entry_type == "cash_in" else -amount
+                continue
+            totals.setdefault(entry_date, [ZERO, ZERO])[0 if entry_type == "cash_in" else 1] += amount
+        periods = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+    balance = opening
+    series = []
+    for period in periods:
+        total_in, total_out = totals.get(period, (ZERO, ZERO))
+        balance += total_in - total_out
+        series.append({
+            "period": period.strftime("%Y-%m") if granularity == "month" else period.isoformat(),
+            "total_in": float(total_in),
+            "total_out": float(total_out),
+            "net": float(total_in - total_out),
+            "balance": float(balance),
+        })
+    return {
+        "cashbook": cb.name,
+        "granularity": granularity,
+        "start": (first_month if granularity == "month" else start).isoformat(),
+        "end": end.isoformat(),
+        "opening_balance": float(opening),
+        "series": series,
+    }
+
+@app.get("/api/report/{cashbook}")
+async def report(
+    cashbook: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    granularity: str = "month",
+    user: User = Depends(require_user),
+    db: DBSession = Depends(get_db),
+):
+    """In/out/balance series for a date range, per ``month`` (default) or ``day``.
+
+    Monthly series cover whole months and default to the last twelve; daily
+    series default to the last thirty days. ``balance`` is the running
+    balance including everything before the range.
+    """
+    if granularity not in ("month", "day"):
+        raise HTTPException(status_code=400, detail="Invalid granularity")
+    end_date = parse_date(end) if end else datetime.utcnow().date()
+    if start:
+        start_date = parse_date(start)
+    elif granularity == "month":
+        start_date = add_months(month_start(end_date), -11)
+    else:
+        start_date = end_date - timedelta(days=29)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if granularity == "day" and (end_date - start_date).days >= REPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Daily reports cover at most {REPORT_MAX_DAYS} days")
+    if granularity == "month" and add_months(month_start(start_date), REPORT_MAX_MONTHS) <= end_date:
+        raise HTTPException(status_code=400, detail=f"Monthly reports cover at most {REPORT_MAX_MONTHS} months")
+    return await run_db(db, report_sync, user, cashbook, start_date, end_date, granularity)
+
+# ------------------ EXPORT --------------------
+def export_statement(user_id: int, cashbook_id: Optional[int] = None):
+    """All of a user's entries as (cashbook name, entry columns...) rows in one query."""
+    stmt = (
+        select(Cashbook.name, Entry.id, Entry.date, Entry.type, Entry.amount, Entry.note)
+        .join(Entry, Entry.cashbook_id == Cashbook.id)
+        .where(Cashbook.owner_id == user_id)
+    )
+    if cashbook_id is not None:
+        stmt = stmt.where(Cashbook.id == cashbook_id)
+    return stmt.order_by(Cashbook.name, Entry.date, Entry.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+def export_row(row) -> Dict[str, Any]:
+    name, entry_id, entry_date, entry_type, amount, note = row
+    return {"cashbook": name, "id": entry_id, "date": entry_date.isoformat(), "type": entry_type, "amount": float(amount), "note": note}
+
+def render_export_rows(rows, fmt: str) -> str:
+    buffer = io.StringIO()
+    if fmt == "csv":
+        csv.writer(buffer).writerows(rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(export_row(row)))
+            buffer.write("\n")
+    return buffer.getvalue()
+
+def stream_export(user_id: int, cashbook_id: Optional[int], fmt: str):
+    """Yield the export in chunks of EXPORT_BATCH_SIZE rows.
+
+    Rows are fetched with yield_per (a server-side cursor on Postgres), so
+    memory stays flat however many entries the user has. The request's own
+    session is closed before the body streams, hence the dedicated one here.
+    """
+    if fmt == "csv":
+        yield render_export_rows([EXPORT_FIELDS], fmt)
+    db = SessionLocal()
+    try:
+        for rows in db.execute(export_statement(user_id, cashbook_id)).partitions():
+            yield render_export_rows(rows, fmt)
+    finally:
+        db.close()
+
+async def stream_export_async(user_id: int, cashbook_id: Optional[int], fmt: str):
+    """Async-mode counterpart of stream_export."""
+    if fmt == "csv":
+        yield render_export_rows([EXPORT_FIELDS], fmt)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(export_statement(user_id, cashbook_id))
+        async for rows in result.partitions():
+            yield render_export_rows(rows, fmt)
+
+def export_lookup(db: Session, user: User, cashbook: Optional[str]) -> Optional[Tuple[int, str]]:
+    if not cashbook:
+        return None
+    cb = get_cashbook(db, user, sanitize_cashbook_name(cashbook))
+    return cb.id, cb.name
+
+def export_json(db: Session, user: User, cashbook: Optional[Tuple[int, str]]) -> Dict[str, Any]:
     if cashbook:
-        name = sanitize_cashbook_name(cashbook)
-        cb = db.query(Cashbook).filter(Cashbook.owner == user, Cashbook.name == name).first()
-        if not cb:
-            raise HTTPException(status_code=404, detail="Cashbook not found")
-        payload = {
-            "username": user.username,
-            "cashbooks": {
-                name: [{"id": e.id, "date": e.date, "type": e.type, "amount": e.amount, "note": e.note} for e in cb.entries]
-            }
-        }
+        books = {cashbook[1]: []}
     else:
-        payload = {
-            "username": user.username,
-            "cashbooks": {
-                c.name: [{"id": e.id, "date": e.date, "type": e.type, "amount": e.amount, "note": e.note} for e in c.entries] for c in user.cashbooks
-            }
-        }
-    return JSONResponse(payload)
+        books = {name: [] for (name,) in db.query(Cashbook.name).filter(Cashbook.owner_id == user.id)}
+    for row in db.execute(export_statement(user.id, cashbook[0] if cashbook else None)):
+        entry = export_row(row)
+        books[entry.pop("cashbook")].append(entry)
+    return {"username": user.username, "cashbooks": books}
+
+@app.get("/api/export")
+async def export(cashbook: Optional[str] = None, format: str = "json", user: User = Depends(require_user), db: DBSession = Depends(get_db)):
+    """Export entries as a single JSON document, or stream them as NDJSON/CSV.
+
+    The JSON document is built in memory and suits small exports; use
+    ``format=ndjson`` or ``format=csv`` for large ones.
+    """
+    if format not in ("json", "ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Invalid format")
+    cb = await run_db(db, export_lookup, user, cashbook)
+    if format == "json":
+        return JSONResponse(await run_db(db, export_json, user, cb))
+    # The body streams on its own session; hand this one's connection back
+    # first so concurrent exports cannot exhaust the pool.
+    await run_db(db, Session.close)
+    cashbook_id, name = cb if cb else (None, "cashbooks")
+    stream = stream_export_async if DB_ASYNC else stream_export
+    filename = re.sub(r"[^\w.-]+", "_", name) + f".{format}"
+    return StreamingResponse(
+        stream(user.id, cashbook_id, format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics_api(request: Request):
+    """Per-route request counts, latency histograms and SQL usage for this worker."""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {METRICS_TOKEN}".encode()
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode(), expected):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return metrics.snapshot()
 
 @app.get("/api/health", include_in_schema=False)
 def health():
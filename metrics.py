@@ -0,0 +1,115 @@
+"""In-process request metrics for CashBook+.
+
+Each worker keeps, per route: request and error counts, a latency histogram
+and the number of SQL statements (and time spent in them) issued while the
+request was handled. Statements are attributed through a context variable
+set by the middleware in main.py; SQLAlchemy engine events do the counting.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+
+# Upper bounds in seconds; the last bucket catches everything slower.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.queries = 0
+        self.queries_max = 0
+        self.sql_time = 0.0
+
+    def record(self, status_code: int, elapsed: float, stats: RequestStats) -> None:
+        self.count += 1
+        if status_code >= 500:
+            self.errors += 1
+        self.latency_sum += elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+        self.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.queries += stats.queries
+        self.queries_max = max(self.queries_max, stats.queries)
+        self.sql_time += stats.sql_time
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile request."""
+        target = self.count * pct / 100
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.latency_max)
+        return self.latency_max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "latency_ms": {
+                "mean": round(self.latency_sum / self.count * 1000, 3) if self.count else 0,
+                "p50": round(self.percentile(50) * 1000, 3),
+                "p99": round(self.percentile(99) * 1000, 3),
+                "max": round(self.latency_max * 1000, 3),
+                "buckets": {("+Inf" if b == float("inf") else str(b)): n for b, n in zip(LATENCY_BUCKETS, self.buckets)},
+            },
+            "sql": {
+                "queries": self.queries,
+                "queries_per_request": round(self.queries / self.count, 2) if self.count else 0,
+                "max_queries_per_request": self.queries_max,
+                "time_ms": round(self.sql_time * 1000, 3),
+            },
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.routes: Dict[str, RouteMetrics] = {}
+
+    def record(self, route: str, status_code: int, elapsed: float, stats: RequestStats) -> None:
+        if route not in self.routes:
+            self.routes[route] = RouteMetrics()
+        self.routes[route].record(status_code, elapsed, stats)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "routes": {route: m.to_dict() for route, m in sorted(self.routes.items())},
+        }
+
+
+def instrument_engine(engine) -> None:
+    """Count statements run on ``engine`` against the current request, if any."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_time += time.perf_counter() - started
+
+
+metrics = Metrics()
@@ -0,0 +1,193 @@
+"""Upgrade an existing CashBook+ database in place.
+
+``Base.metadata.create_all`` (see init_db.py) only creates missing tables, so
+columns and indexes added to existing tables are applied here. Every step is
+idempotent and safe to re-run:
+
+    python migrate.py
+"""
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from main import Base, engine, rebuild_totals, CENTS, SESSION_MAX_AGE
+
+
+def _columns(conn, table):
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _column_types(conn, table):
+    return {c["name"]: str(c["type"]) for c in inspect(conn).get_columns(table)}
+
+
+def _indexes(conn, table):
+    return {i["name"] for i in inspect(conn).get_indexes(table)}
+
+
+def _rebuild_sqlite_table(conn, table, **expressions):
+    """Recreate ``table`` from the model and copy its rows across.
+
+    SQLite cannot change a column's type or constraints in place.
+    ``expressions`` replace the SELECT expression of individual columns.
+    Rows of cashbooks that no longer exist are dropped.
+    """
+    columns = [c.name for c in Base.metadata.tables[table].columns]
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_old"))
+    for index in _indexes(conn, f"{table}_old"):
+        conn.execute(text(f"DROP INDEX {index}"))
+    Base.metadata.tables[table].create(conn)
+    conn.execute(text(
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"SELECT {', '.join(expressions.get(c, c) for c in columns)} FROM {table}_old "
+        "WHERE cashbook_id IN (SELECT id FROM cashbooks)"
+    ))
+    conn.execute(text(f"DROP TABLE {table}_old"))
+
+
+def rename_cashbook_owner(conn):
+    # The first SQLite schema (data/cashbook.db) named the owner column user_id.
+    columns = _columns(conn, "cashbooks")
+    if "user_id" in columns and "owner_id" not in columns:
+        conn.execute(text("ALTER TABLE cashbooks RENAME COLUMN user_id TO owner_id"))
+
+
+def add_session_expiry(conn):
+    if "expires_at" not in _columns(conn, "sessions"):
+        conn.execute(text("ALTER TABLE sessions ADD COLUMN expires_at TIMESTAMP"))
+    if "ix_sessions_expires_at" not in _indexes(conn, "sessions"):
+        conn.execute(text("CREATE INDEX ix_sessions_expires_at ON sessions (expires_at)"))
+    # Sessions issued before expiry was tracked get one more cookie lifetime.
+    conn.execute(
+        text("UPDATE sessions SET expires_at = :expires_at WHERE expires_at IS NULL"),
+        {"expires_at": datetime.utcnow() + timedelta(seconds=SESSION_MAX_AGE)},
+    )
+
+
+def add_entries_keyset_index(conn):
+    if "ix_entries_cashbook_date_id" not in _indexes(conn, "entries"):
+        conn.execute(text("CREATE INDEX ix_entries_cashbook_date_id ON entries (cashbook_id, date, id)"))
+
+
+def convert_entry_types(conn):
+    if conn.dialect.name != "postgresql":
+        normalize_sqlite_entries(conn)
+        return
+    types = _column_types(conn, "entries")
+    if not types["date"].startswith("DATE"):
+        conn.execute(text("ALTER TABLE entries ALTER COLUMN date TYPE DATE USING date::date"))
+    if not types["amount"].startswith("NUMERIC"):
+        # The old float check let NaN and infinity through; NUMERIC would keep NaN.
+        removed = conn.execute(text("DELETE FROM entries WHERE amount IN ('NaN', 'Infinity', '-Infinity')")).rowcount
+        if removed:
+            print(f"  removed {removed} entries with a non-finite amount")
+        conn.execute(text("ALTER TABLE entries ALTER COLUMN amount TYPE NUMERIC(12, 2) USING round(amount::numeric, 2)"))
+        conn.execute(text(
+            "ALTER TABLE cashbook_totals"
+            " ALTER COLUMN total_in TYPE NUMERIC(14, 2) USING round(total_in::numeric, 2),"
+            " ALTER COLUMN total_out TYPE NUMERIC(14, 2) USING round(total_out::numeric, 2)"
+        ))
+
+
+def normalize_sqlite_entries(conn):
+    """Rewrite entries the old String/Float columns accepted but Date/Numeric cannot read.
+
+    SQLite has no column types to convert, but old rows may hold unpadded
+    dates (``2025-1-5``), amounts with more than two decimals, or NaN
+    (stored as NULL) and infinite amounts. Dates are rewritten as ISO dates
+    and amounts rounded to cents, as on Postgres; rows without a valid date
+    or a finite amount are removed and reported.
+    """
+    rows = conn.execute(text(
+        "SELECT rowid, date, amount FROM entries"
+        " WHERE date IS NULL OR date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+        " OR amount IS NULL OR abs(amount) > 1e308 OR amount != round(amount, 2)"
+    )).all()
+    for rowid, date_str, amount in rows:
+        try:
+            entry_date = datetime.strptime(str(date_str), "%Y-%m-%d").date()
+            amount = Decimal(str(amount))
+        except ArithmeticError:
+            amount = None
+        except ValueError:
+            entry_date = None
+        if entry_date is None or amount is None or not amount.is_finite():
+            conn.execute(text("DELETE FROM entries WHERE rowid = :rowid"), {"rowid": rowid})
+            print(f"  removed entry with date={date_str!r} amount={amount!r}")
+            continue
+        conn.execute(
+            text("UPDATE entries SET date = :date, amount = :amount WHERE rowid = :rowid"),
+            {"date": entry_date.isoformat(), "amount": float(amount.quantize(CENTS, rounding=ROUND_HALF_UP)), "rowid": rowid},
+        )
+
+
+def add_cashbook_version(conn):
+    if "version" not in _columns(conn, "cashbooks"):
+        conn.execute(text("ALTER TABLE cashbooks ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def backfill_monthly_rollups(conn):
+    # Also repairs totals after convert_entry_types; a no-op once they match.
+    with Session(bind=conn) as db:
+        rebuild_totals(db)
+        db.flush()
+
+
+def compact_entry_ids(conn):
+    # The primary key already indexes the id.
+    if "ix_entries_id" in _indexes(conn, "entries"):
+        conn.execute(text("DROP INDEX ix_entries_id"))
+    id_type = _column_types(conn, "entries")["id"]
+    if conn.dialect.name == "postgresql":
+        if id_type != "UUID":
+            conn.execute(text("ALTER TABLE entries ALTER COLUMN id TYPE UUID USING id::uuid"))
+    elif id_type != "BLOB":
+        conn.connection.create_function("uuid_bytes", 1, lambda value: uuid.UUID(value).bytes)
+        _rebuild_sqlite_table(conn, "entries", id="uuid_bytes(id)")
+
+
+def cascade_cashbook_deletes(conn):
+    for table in ("entries", "cashbook_totals", "cashbook_months"):
+        fk = next(fk for fk in inspect(conn).get_foreign_keys(table) if fk["referred_table"] == "cashbooks")
+        if (fk["options"].get("ondelete") or "").upper() == "CASCADE":
+            continue
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(
+                f"ALTER TABLE {table} DROP CONSTRAINT {fk['name']},"
+                f" ADD CONSTRAINT {fk['name']} FOREIGN KEY (cashbook_id) REFERENCES cashbooks (id) ON DELETE CASCADE"
+            ))
+        else:
+            _rebuild_sqlite_table(conn, table)
+
+
+MIGRATIONS = [
+    rename_cashbook_owner,
+    add_session_expiry,
+    add_entries_keyset_index,
+    convert_entry_types,
+    # rebuild_totals (the backfill) bumps cashbooks.version.
+    add_cashbook_version,
+    backfill_monthly_rollups,
+    compact_entry_ids,
+    cascade_cashbook_deletes,
+]
+
+
+def upgrade(engine):
+    Base.metadata.create_all(engine)
+    for migration in MIGRATIONS:
+        with engine.begin() as conn:
+            migration(conn)
+        print(f"Applied {migration.__name__}")
+
+
+def main():
+    upgrade(engine)
+    print("Database is up to date!")
+
+
+if __name__ == "__main__":
+    main()
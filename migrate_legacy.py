@@ -0,0 +1,119 @@
+"""Load the legacy JSON file store into the database.
+
+Reads ``data/users.json`` (users with their cashbooks and entries) and
+``data/sessions.json`` (token -> username) and bulk-inserts whatever is not
+already present, so the script can be re-run safely:
+
+    python migrate_legacy.py [--users data/users.json] [--sessions data/sessions.json]
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from main import (
+    Base, SessionLocal, engine, User, Cashbook, Entry, SessionToken,
+    SESSION_MAX_AGE, IMPORT_BATCH_SIZE, normalize_entry_id, validate_import_rows, rebuild_totals,
+)
+
+
+def bulk_insert(db, model, values):
+    for start in range(0, len(values), IMPORT_BATCH_SIZE):
+        db.execute(insert(model), values[start:start + IMPORT_BATCH_SIZE])
+
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def migrate(db, users_data, sessions_data):
+    existing_users = {u.username: u.id for u in db.query(User.id, User.username)}
+    new_users = [
+        {"username": u["username"], "password_hash": u["password_hash"]}
+        for u in users_data
+        if u.get("username") and u["username"] not in existing_users
+    ]
+    bulk_insert(db, User, new_users)
+    user_ids = {u.username: u.id for u in db.query(User.id, User.username)}
+
+    existing_books = {(c.owner_id, c.name): c.id for c in db.query(Cashbook.id, Cashbook.owner_id, Cashbook.name)}
+    new_books = []
+    for u in users_data:
+        owner_id = user_ids.get(u.get("username"))
+        for name in (u.get("cashbooks") or {}):
+            if owner_id is not None and (owner_id, name) not in existing_books:
+                new_books.append({"owner_id": owner_id, "name": name})
+    bulk_insert(db, Cashbook, new_books)
+    book_ids = {(c.owner_id, c.name): c.id for c in db.query(Cashbook.id, Cashbook.owner_id, Cashbook.name)}
+
+    existing_entries = {entry_id for (entry_id,) in db.query(Entry.id)}
+    entries, skipped, duplicates, ownerless = [], 0, 0, 0
+    seen = set()
+    for u in users_data:
+        owner_id = user_ids.get(u.get("username"))
+        for name, rows in (u.get("cashbooks") or {}).items():
+            cashbook_id = book_ids.get((owner_id, name))
+            if cashbook_id is None:
+                # Users without a username have no account to own these.
+                ownerless += len(rows)
+                continue
+            rows = [r for r in rows if normalize_entry_id(r.get("id")) not in existing_entries]
+            values, errors = validate_import_rows(rows, cashbook_id)
+            skipped += len(errors)
+            invalid = {e["row"] for e in errors}
+            valid_rows = [r for n, r in enumerate(rows, start=1) if n not in invalid]
+            # Keep the legacy ids so exported references stay valid.
+            for value, row in zip(values, valid_rows):
+                legacy_id = normalize_entry_id(row.get("id"))
+                if legacy_id in seen:
+                    duplicates += 1
+                    continue
+                value["id"] = legacy_id or value["id"]
+                seen.add(value["id"])
+                entries.append(value)
+    bulk_insert(db, Entry, entries)
+
+    existing_tokens = {token for (token,) in db.query(SessionToken.token)}
+    expires_at = datetime.utcnow() + timedelta(seconds=SESSION_MAX_AGE)
+    sessions = [
+        {"token": token, "username": username, "expires_at": expires_at}
+        for token, username in sessions_data.items()
+        if token not in existing_tokens and username in user_ids
+    ]
+    bulk_insert(db, SessionToken, sessions)
+
+    rebuild_totals(db)
+    return {
+        "users": len(new_users),
+        "cashbooks": len(new_books),
+        "entries": len(entries),
+        "invalid_entries": skipped,
+        "duplicate_entries": duplicates,
+        "ownerless_entries": ownerless,
+        "sessions": len(sessions),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="data/users.json")
+    parser.add_argument("--sessions", default="data/sessions.json")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        counts = migrate(db, load_json(args.users, []), load_json(args.sessions, {}))
+        db.commit()
+    finally:
+        db.close()
+    print("Migrated " + ", ".join(f"{count} {kind}" for kind, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Recompute cashbook running totals and monthly rollups from the raw entries.
+
+    python rebuild_totals.py          # rewrite missing or drifted totals
+    python rebuild_totals.py --check  # report drift only; exit 1 if any
+"""
+import argparse
+import sys
+
+from main import Base, SessionLocal, engine, rebuild_totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="verify totals without modifying them")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        mismatches = rebuild_totals(db, fix=not args.check)
+        for m in mismatches:
+            stale = " (monthly rollups stale)" if m["monthly_rollups_stale"] else ""
+            print(f"cashbook {m['cashbook_id']}: stored={m['stored']} actual={m['actual']}{stale}")
+        if args.check:
+            print(f"{len(mismatches)} cashbook(s) out of date")
+            return 1 if mismatches else 0
+        db.commit()
+        print(f"Rebuilt totals for {len(mismatches)} cashbook(s)")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
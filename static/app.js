@@ -2,6 +2,7 @@ const state = {
 	username: "",
 	activeCashbook: "",
 	allEntries: [],
+	nextCursor: null,
 	summary: { total_in: 0, total_out: 0, balance: 0 },
 };
 
@@ -102,24 +103,58 @@ function updateSummaryCards(summary) {
 	state.summary = summary;
 }
 
-function applyFilters() {
+const PAGE_SIZE = 100;
+let filterTimer = null;
+
+function getFilterParams() {
 	const keywordInput = document.getElementById("search-input");
 	const dateInput = document.getElementById("date-filter");
-	const keyword = (keywordInput?.value || "").trim().toLowerCase();
+	const params = new URLSearchParams({ cashbook: state.activeCashbook, limit: PAGE_SIZE });
+	const keyword = (keywordInput?.value || "").trim();
 	const dateFilter = dateInput?.value || "";
-	let filtered = [...state.allEntries];
-	if (keyword) {
-		filtered = filtered.filter((entry) => {
-			return (
-				String(entry.note || "").toLowerCase().includes(keyword) ||
-				String(entry.amount).includes(keyword)
-			);
-		});
-	}
+	if (keyword) params.set("q", keyword);
 	if (dateFilter) {
-		filtered = filtered.filter((entry) => entry.date === dateFilter);
+		params.set("date_from", dateFilter);
+		params.set("date_to", dateFilter);
+	}
+	return params;
+}
+
+async function fetchEntriesPage(cursor = null) {
+	const params = getFilterParams();
+	if (cursor) params.set("cursor", cursor);
+	return fetchJSON(`/api/get_entries?${params.toString()}`);
+}
+
+async function fetchAllEntries() {
+	const entries = [...state.allEntries];
+	let cursor = state.nextCursor;
+	while (cursor) {
+		const page = await fetchEntriesPage(cursor);
+		entries.push(...(page.entries || []));
+		cursor = page.next_cursor;
+	}
+	return entries;
+}
+
+function applyFilters() {
+	clearTimeout(filterTimer);
+	filterTimer = setTimeout(() => loadEntries(), 250);
+}
+
+async function loadMoreEntries() {
+	if (!state.nextCursor) return;
+	showLoading(true);
+	try {
+		const page = await fetchEntriesPage(state.nextCursor);
+		state.allEntries = state.allEntries.concat(page.entries || []);
+		state.nextCursor = page.next_cursor || null;
+		renderEntries(state.allEntries);
+	} catch (error) {
+		showToast(error.message, "error");
+	} finally {
+		showLoading(false);
 	}
-	renderEntries(filtered);
 }
 
 function renderEntries(entries = []) {
@@ -136,27 +171,29 @@ function renderEntries(entries = []) {
 		row.appendChild(cell);
 		tbody.appendChild(row);
 		countEl && (countEl.textContent = "0 entries");
+		const loadMoreBtn = document.getElementById("load-more");
+		if (loadMoreBtn) loadMoreBtn.style.display = "none";
 		updateInsights([]);
 		return;
 	}
-	entries
-		.slice()
-		.sort((a, b) => new Date(b.date) - new Date(a.date))
-		.forEach((entry) => {
-			const row = document.createElement("tr");
-			row.setAttribute("data-type", entry.type);
-			row.innerHTML = `
-				<td>${entry.date}</td>
-				<td>${entry.type === "cash_in" ? "Cash In" : "Cash Out"}</td>
-				<td>${formatCurrency(entry.amount)}</td>
-				<td>${entry.note || "—"}</td>
-				<td>
-					<button class="btn ghost" data-delete="${entry.id}">Delete</button>
-				</td>
-			`;
-			tbody.appendChild(row);
-		});
-	countEl && (countEl.textContent = `${entries.length} ${entries.length === 1 ? "entry" : "entries"}`);
+	entries.forEach((entry) => {
+		const row = document.createElement("tr");
+		row.setAttribute("data-type", entry.type);
+		row.innerHTML = `
+			<td>${entry.date}</td>
+			<td>${entry.type === "cash_in" ? "Cash In" : "Cash Out"}</td>
+			<td>${formatCurrency(entry.amount)}</td>
+			<td>${entry.note || "—"}</td>
+			<td>
+				<button class="btn ghost" data-delete="${entry.id}">Delete</button>
+			</td>
+		`;
+		tbody.appendChild(row);
+	});
+	const more = state.nextCursor ? "+" : "";
+	countEl && (countEl.textContent = `${entries.length}${more} ${entries.length === 1 && !more ? "entry" : "entries"}`);
+	const loadMoreBtn = document.getElementById("load-more");
+	if (loadMoreBtn) loadMoreBtn.style.display = state.nextCursor ? "" : "none";
 	updateInsights(entries);
 }
 
@@ -171,8 +208,9 @@ function updateInsights(entries) {
 		return;
 	}
 
-	const totalIn = entries.filter((e) => e.type === "cash_in").reduce((sum, e) => sum + Number(e.amount), 0);
-	const totalOut = entries.filter((e) => e.type === "cash_out").reduce((sum, e) => sum + Number(e.amount), 0);
+	// Only the first pages are loaded, so cashbook-wide totals come from the summary.
+	const totalIn = Number(state.summary.total_in) || 0;
+	const totalOut = Number(state.summary.total_out) || 0;
 
 	const now = new Date();
 	const sevenDaysAgo = new Date(now);
@@ -194,14 +232,17 @@ function updateInsights(entries) {
 	if (totalIn > 0) {
 		insights.push(`You have logged ${formatCurrency(totalIn)} in cash inflows.`);
 	}
-	if (spendPrevWeek > 0) {
+	// The week-on-week comparison needs both weeks loaded.
+	const oldestLoaded = new Date(entries[entries.length - 1].date);
+	const coversTwoWeeks = !state.nextCursor || oldestLoaded < fourteenDaysAgo;
+	if (coversTwoWeeks && spendPrevWeek > 0) {
 		const diff = spendLastWeek - spendPrevWeek;
 		const percentage = (diff / spendPrevWeek) * 100;
 		if (Math.abs(percentage) >= 10) {
 			const direction = percentage > 0 ? "more" : "less";
 			insights.push(`You spent ${Math.abs(percentage).toFixed(1)}% ${direction} this week compared to last.`);
 		}
-	} else if (spendLastWeek > 0) {
+	} else if (coversTwoWeeks && spendLastWeek > 0) {
 		insights.push("New spending appeared this week. Track recurring expenses for better planning.");
 	}
 
@@ -215,7 +256,7 @@ function updateInsights(entries) {
 	const sortedNotes = Object.entries(topNotes).sort((a, b) => b[1] - a[1]);
 	if (sortedNotes.length > 0) {
 		const [note, amount] = sortedNotes[0];
-		insights.push(`Top spending note: "${note}" (${formatCurrency(amount)}).`);
+		insights.push(`Top spending note in loaded entries: "${note}" (${formatCurrency(amount)}).`);
 	}
 
 	if (state.summary.balance < 0) {
@@ -235,20 +276,25 @@ function updateInsights(entries) {
 
 async function loadEntries() {
 	if (!state.activeCashbook) {
+		state.nextCursor = null;
 		renderEntries([]);
 		updateSummaryCards({ total_in: 0, total_out: 0, balance: 0 });
 		return;
 	}
 	showLoading(true);
 	try {
-		const entriesResponse = await fetchJSON(`/api/get_entries?cashbook=${encodeURIComponent(state.activeCashbook)}`);
-		state.allEntries = entriesResponse.entries || [];
+		// One request for the first page and the summary; the browser revalidates
+		// it with the cashbook's ETag, so an unchanged cashbook costs a 304.
+		const params = getFilterParams();
+		params.delete("cashbook");
+		const dashboard = await fetchJSON(`/api/dashboard/${encodeURIComponent(state.activeCashbook)}?${params.toString()}`);
+		state.allEntries = dashboard.entries || [];
+		state.nextCursor = dashboard.next_cursor || null;
 
 		// ✅ Save entries locally for export
 		localStorage.setItem(`transactions_${state.activeCashbook}`, JSON.stringify(state.allEntries));
 
-		const summary = await fetchJSON(`/api/summary/${encodeURIComponent(state.activeCashbook)}`);
-		updateSummaryCards(summary);
+		updateSummaryCards(dashboard.summary);
 		renderEntries(state.allEntries);
 	} catch (error) {
 		showToast(error.message, "error");
@@ -364,6 +410,8 @@ function bindEvents() {
 	const searchInput = document.getElementById("search-input");
 	const dateFilter = document.getElementById("date-filter");
 	const clearFilters = document.getElementById("clear-filters");
+	const loadMoreBtn = document.getElementById("load-more");
+	loadMoreBtn && loadMoreBtn.addEventListener("click", loadMoreEntries);
 	searchInput && searchInput.addEventListener("input", applyFilters);
 	dateFilter && dateFilter.addEventListener("input", applyFilters);
 	clearFilters &&
@@ -412,7 +460,7 @@ function bindEvents() {
 
 // 🧾 Export filtered data as PDF or Excel
 async function exportPDFOnly(cashbook) {
-	const entries = state.allEntries || [];
+	const entries = await fetchAllEntries();
 	if (!entries.length) return showToast("No data to export.", "info");
 
 	const { jsPDF } = window.jspdf;
@@ -460,7 +508,7 @@ async function exportPDFOnly(cashbook) {
 }
 
 async function exportExcelOnly(cashbook) {
-	const entries = state.allEntries || [];
+	const entries = await fetchAllEntries();
 	if (!entries.length) return showToast("No data to export.", "info");
 
 	const rows = entries
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway SQLite file before main is imported; never at
+# whatever DATABASE_URL the shell has configured.
+TEST_DIR = tempfile.mkdtemp(prefix="cashbook-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["DB_ASYNC"] = "0"
+os.environ["SESSION_SWEEP_INTERVAL"] = "0"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    main.Base.metadata.drop_all(main.engine)
+    main.Base.metadata.create_all(main.engine)
+    session = main.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    """A logged-in client owning an empty cashbook named ``book``."""
+    with TestClient(main.app, base_url="https://testserver") as c:
+        assert c.post("/api/register", json={"username": "tester", "password": "secret1"}).status_code == 200
+        assert c.post("/api/login", json={"username": "tester", "password": "secret1"}).status_code == 200
+        assert c.post("/api/create_cashbook", json={"name": "book"}).status_code == 200
+        yield c
@@ -0,0 +1,27 @@
+from decimal import Decimal
+
+import pytest
+
+from main import parse_amount, validate_import_rows
+
+
+def test_parse_amount_rounds_to_cents():
+    assert parse_amount("12.345") == Decimal("12.34")
+    assert parse_amount(7) == Decimal("7.00")
+
+
+@pytest.mark.parametrize("value", ["NaN", "sNaN", "-NaN", "Infinity", "-Infinity", "0", "-5", "abc", None, "1e30"])
+def test_parse_amount_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        parse_amount(value)
+
+
+def test_import_reports_nan_rows():
+    rows = [
+        {"date": "2025-01-01", "type": "cash_in", "amount": "NaN"},
+        {"date": "2025-01-01", "type": "cash_out", "amount": "sNaN"},
+        {"date": "2025-01-01", "type": "cash_in", "amount": "10"},
+    ]
+    values, errors = validate_import_rows(rows, cashbook_id=1)
+    assert [v["amount"] for v in values] == [Decimal("10.00")]
+    assert errors == [{"row": 1, "error": "Invalid amount"}, {"row": 2, "error": "Invalid amount"}]
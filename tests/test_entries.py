@@ -0,0 +1,55 @@
+import base64
+import json
+
+import pytest
+
+
+def import_entries(client, rows):
+    response = client.post("/api/import_entries?cashbook=book", json=rows)
+    assert response.json()["imported"] == len(rows)
+
+
+def fetch_all(client, **params):
+    ids, cursor = [], None
+    while True:
+        query = {"cashbook": "book", **params, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/get_entries", params=query).json()
+        assert len(page["entries"]) <= params.get("limit", 100)
+        ids += [(e["date"], e["id"]) for e in page["entries"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids
+
+
+def test_keyset_pages_cover_same_date_entries_once(client):
+    import_entries(client, [{"date": "2025-03-01", "type": "cash_out", "amount": n + 1} for n in range(45)])
+    import_entries(client, [{"date": day, "type": "cash_in", "amount": 5} for day in ("2025-02-28", "2025-03-02")])
+
+    seen = fetch_all(client, limit=7)
+
+    assert len(seen) == 47
+    assert len({entry_id for _, entry_id in seen}) == 47
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_keyset_pages_respect_filters(client):
+    import_entries(client, [
+        {"date": "2025-04-0%d" % (n % 3 + 1), "type": "cash_in" if n % 2 else "cash_out", "amount": 1, "note": "n%d" % n}
+        for n in range(20)
+    ])
+
+    seen = fetch_all(client, limit=3, type="cash_in", date_from="2025-04-02")
+
+    assert len(seen) == len({entry_id for _, entry_id in seen}) == 7
+    assert seen == sorted(seen, reverse=True)
+    assert all(day >= "2025-04-02" for day, _ in seen)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    base64.urlsafe_b64encode(b"[1, 2, 3]").decode(),
+    base64.urlsafe_b64encode(json.dumps(["2025-01-01", "not-a-uuid"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(["01/01/2025", "00000000-0000-4000-8000-000000000000"]).encode()).decode(),
+])
+def test_bad_cursor_is_rejected(client, cursor):
+    assert client.get("/api/get_entries", params={"cashbook": "book", "cursor": cursor}).status_code == 400
@@ -0,0 +1,16 @@
+import main
+
+
+def test_metrics_not_served_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "")
+    assert client.get("/api/metrics").status_code == 404
+
+
+def test_metrics_require_the_configured_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "s3cret-token")
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer s3cret-token"})
+    assert response.status_code == 200
+    assert "GET /api/metrics" in response.json()["routes"]
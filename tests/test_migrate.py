@@ -0,0 +1,80 @@
+import sqlite3
+import uuid
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import Session
+
+import main
+import migrate
+
+# The schema create_all produced before migrate.py existed.
+BASELINE_SCHEMA = """
+CREATE TABLE users (id INTEGER NOT NULL, username VARCHAR, password_hash VARCHAR, PRIMARY KEY (id));
+CREATE UNIQUE INDEX ix_users_username ON users (username);
+CREATE TABLE cashbooks (
+    id INTEGER NOT NULL, name VARCHAR, owner_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(owner_id) REFERENCES users (id)
+);
+CREATE TABLE entries (
+    id VARCHAR NOT NULL, cashbook_id INTEGER, date VARCHAR, type VARCHAR, amount FLOAT, note VARCHAR,
+    PRIMARY KEY (id), FOREIGN KEY(cashbook_id) REFERENCES cashbooks (id)
+);
+CREATE INDEX ix_entries_id ON entries (id);
+CREATE TABLE sessions (
+    token VARCHAR NOT NULL, username VARCHAR,
+    PRIMARY KEY (token), FOREIGN KEY(username) REFERENCES users (username)
+);
+CREATE INDEX ix_sessions_token ON sessions (token);
+"""
+
+
+def baseline_engine(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO users VALUES (1, 'alice', 'x')")
+    conn.executemany("INSERT INTO cashbooks VALUES (?, ?, 1)", [(1, "doomed"), (2, "kept")])
+    conn.executemany(
+        "INSERT INTO entries VALUES (?, ?, ?, ?, ?, '')",
+        [(str(uuid.uuid4()), n % 2 + 1, f"2025-{n % 12 + 1}-{n % 28 + 1}", "cash_in", n + 0.505) for n in range(60)],
+    )
+    conn.commit()
+    conn.close()
+    engine = create_engine(f"sqlite:///{path}")
+    main.enable_sqlite_foreign_keys(engine)
+    return engine
+
+
+def counts(db, cashbook_id):
+    return [
+        db.query(model).filter(model.cashbook_id == cashbook_id).count()
+        for model in (main.Entry, main.CashbookTotals, main.CashbookMonth)
+    ]
+
+
+def test_upgraded_baseline_cascades_cashbook_deletes(tmp_path):
+    engine = baseline_engine(str(tmp_path / "baseline.db"))
+    migrate.upgrade(engine)
+    migrate.upgrade(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    columns = {c["name"]: str(c["type"]) for c in inspect(engine).get_columns("entries")}
+    assert columns["id"] == "BLOB"
+    assert "ix_entries_id" not in {i["name"] for i in inspect(engine).get_indexes("entries")}
+
+    with Session(engine) as db:
+        assert main.rebuild_totals(db, fix=False) == []
+        assert counts(db, 1)[0] == counts(db, 2)[0] == 30
+        assert all(count > 0 for count in counts(db, 1) + counts(db, 2))
+        entry_id = db.query(main.Entry.id).filter(main.Entry.cashbook_id == 2).first()[0]
+        assert db.get(main.Entry, entry_id).id == entry_id
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        db.delete(db.get(main.Cashbook, 1))
+        db.commit()
+
+        assert [s for s in statements if s.startswith("DELETE")] == ["DELETE FROM cashbooks WHERE cashbooks.id = ?"]
+        assert counts(db, 1) == [0, 0, 0]
+        assert counts(db, 2)[0] == 30
+        assert main.rebuild_totals(db, fix=False) == []
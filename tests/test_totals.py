@@ -0,0 +1,52 @@
+from datetime import date
+
+import main
+
+
+def add(client, entry_type, amount, entry_date):
+    response = client.post("/api/add_entry", json={"cashbook": "book", "type": entry_type, "amount": amount, "date": entry_date})
+    assert response.status_code == 200
+    return response.json()["entry"]["id"]
+
+
+def months(db):
+    return {m.month: (m.total_in, m.total_out, m.entry_count) for m in db.query(main.CashbookMonth)}
+
+
+def test_totals_and_rollups_follow_entry_changes(client, db):
+    add(client, "cash_in", "100.10", "2025-01-05")
+    add(client, "cash_out", "0.30", "2025-01-20")
+    february = add(client, "cash_out", "40", "2025-02-14")
+    response = client.post("/api/import_entries?cashbook=book", json=[
+        {"date": "2025-01-31", "type": "cash_in", "amount": "0.10"},
+        {"date": "2025-03-01", "type": "cash_out", "amount": "9.99"},
+        {"date": "2025-03-02", "type": "cash_in", "amount": "NaN"},
+    ])
+    assert response.json()["imported"] == 2
+
+    # Deleting February's only entry empties that month.
+    assert client.delete(f"/api/delete_entry/{february}?cashbook=book").status_code == 200
+
+    assert main.rebuild_totals(db, fix=False) == []
+    assert client.get("/api/summary/book").json() == {"total_in": 100.2, "total_out": 10.29, "balance": 89.91}
+    assert sorted(months(db)) == [date(2025, 1, 1), date(2025, 3, 1)]
+
+
+def test_deleting_every_entry_leaves_no_rollups(client, db):
+    ids = [add(client, "cash_in", "1", "2025-05-0%d" % day) for day in (1, 2, 3)]
+    for entry_id in ids:
+        assert client.delete(f"/api/delete_entry/{entry_id}?cashbook=book").status_code == 200
+
+    assert main.rebuild_totals(db, fix=False) == []
+    assert months(db) == {}
+    assert client.get("/api/summary/book").json() == {"total_in": 0.0, "total_out": 0.0, "balance": 0.0}
+
+
+def test_rebuild_totals_reports_and_repairs_drift(client, db):
+    add(client, "cash_in", "5", "2025-01-01")
+    db.query(main.CashbookTotals).update({"total_in": 7})
+    db.commit()
+
+    assert [m["cashbook_id"] for m in main.rebuild_totals(db, fix=True)] == [1]
+    db.commit()
+    assert main.rebuild_totals(db, fix=False) == []